@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Check that a text prompt gives the same GLB alone and inside a batch.
+
+Runs in-process on the GPU host (needs TRELLIS and the model weights), since the
+text cache assumes a result depends only on (prompt, seed) whatever batch the
+worker happened to coalesce it into.
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+from hashlib import blake2b
+
+import torch
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from server.model_manager import manager  # noqa: E402
+
+
+def _max_abs_diff(a: torch.Tensor, b: torch.Tensor) -> str:
+    if a.shape != b.shape:
+        return f"shape {tuple(a.shape)} vs {tuple(b.shape)}"
+    return f"{(a.float() - b.float()).abs().max().item():.3g}"
+
+
+def _digest(data: bytes) -> str:
+    return blake2b(memoryview(data), digest_size=16).hexdigest()
+
+
+async def run(prompt: str, seed: int, batch: int, simplify: float, texture_size: int) -> int:
+    await manager.load()
+    try:
+        single = manager._sample_text(prompt, seed=seed)
+        again = manager._sample_text(prompt, seed=seed)
+        # The other prompts and seeds differ so the target shares a batch with
+        # real neighbours rather than copies of itself.
+        prompts = [prompt] + [f"{prompt}, variant {i}" for i in range(1, batch)]
+        seeds = [seed] + [seed + i for i in range(1, batch)]
+        batched = manager._sample_text_batch(prompts, seeds)[0]
+
+        for label, other in (("single rerun", again), (f"batch of {batch}", batched)):
+            print(f"{label}:")
+            print(f"  gaussian xyz max |diff|: {_max_abs_diff(single['gaussian'][0].get_xyz, other['gaussian'][0].get_xyz)}")
+            print(f"  mesh vertices max |diff|: {_max_abs_diff(single['mesh'][0].vertices, other['mesh'][0].vertices)}")
+            print(f"  mesh faces equal: {torch.equal(single['mesh'][0].faces, other['mesh'][0].faces)}")
+
+        digests = [
+            _digest(manager._to_glb_bytes(outputs, simplify=simplify, texture_size=texture_size))
+            for outputs in (single, again, batched)
+        ]
+    finally:
+        await manager.unload()
+
+    print(f"GLB blake2b single:       {digests[0]}")
+    print(f"GLB blake2b single rerun: {digests[1]}")
+    print(f"GLB blake2b batch of {batch}:   {digests[2]}")
+    if digests[0] != digests[1]:
+        print("to_glb is not deterministic on this host; compare the tensor diffs above instead")
+        return 1
+    if digests[0] != digests[2]:
+        print("MISMATCH: batching changes the result")
+        return 1
+    print("OK: same GLB at batch 1 and inside a batch")
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check batch-1 vs batched text sampling determinism")
+    parser.add_argument("--prompt", default="a wooden chair", help="Prompt to check")
+    parser.add_argument("--seed", type=int, default=1, help="Seed value (default: 1)")
+    parser.add_argument("--batch", type=int, default=4, help="Batch size to compare against (default: 4)")
+    parser.add_argument("--simplify", type=float, default=0.95, help="to_glb simplify ratio (default: 0.95)")
+    parser.add_argument("--texture-size", type=int, default=1024, help="to_glb texture size (default: 1024)")
+
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args.prompt, args.seed, args.batch, args.simplify, args.texture_size))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
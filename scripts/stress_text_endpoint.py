@@ -4,15 +4,16 @@
 from __future__ import annotations
 
 import argparse
+import http.client
 import json
 import random
 import sys
+import threading
 import time
-import urllib.error
-import urllib.request
+import urllib.parse
 from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from hashlib import sha256
+from hashlib import blake2b
 from typing import Optional
 
 
@@ -38,6 +39,27 @@ class RequestResult:
     error: Optional[str]
 
 
+_local = threading.local()
+
+
+def _get_connection(target: urllib.parse.SplitResult, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+    """Return this thread's keep-alive connection and whether it was reused."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn, True
+    conn_cls = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(target.hostname, target.port, timeout=timeout)
+    _local.conn = conn
+    return conn, False
+
+
+def _drop_connection() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
 def issue_request(
     plan: RequestPlan,
     url: str,
@@ -47,52 +69,61 @@ def issue_request(
     if plan.delay_before_send > 0:
         time.sleep(plan.delay_before_send)
 
+    target = urllib.parse.urlsplit(url)
+    path = target.path or "/"
+    if target.query:
+        path = f"{path}?{target.query}"
+    payload = json.dumps({"prompt": plan.prompt, "seed": plan.seed}).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(payload)),
+        "Connection": "keep-alive",
+    }
+
     start = time.perf_counter()
     start_offset = start - test_start
-    payload = json.dumps({"prompt": plan.prompt, "seed": plan.seed}).encode("utf-8")
-    request = urllib.request.Request(
-        url,
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
 
-    try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            body = response.read()
-            status = response.status
-    except urllib.error.HTTPError as exc:
-        duration = time.perf_counter() - start
-        detail = exc.read().decode("utf-8", "replace")
+    def failure(status: Optional[int], error: str) -> RequestResult:
         return RequestResult(
             index=plan.index,
             prompt=plan.prompt,
             seed=plan.seed,
             delay_before_send=plan.delay_before_send,
             start_offset=start_offset,
-            duration=duration,
-            status=exc.code,
+            duration=time.perf_counter() - start,
+            status=status,
             response_bytes=0,
             digest=None,
-            error=detail.strip(),
-        )
-    except urllib.error.URLError as exc:
-        duration = time.perf_counter() - start
-        return RequestResult(
-            index=plan.index,
-            prompt=plan.prompt,
-            seed=plan.seed,
-            delay_before_send=plan.delay_before_send,
-            start_offset=start_offset,
-            duration=duration,
-            status=None,
-            response_bytes=0,
-            digest=None,
-            error=str(exc.reason),
+            error=error,
         )
 
+    while True:
+        conn, reused = _get_connection(target, timeout)
+        try:
+            conn.request("POST", path, body=payload, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            status = response.status
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as exc:
+            _drop_connection()
+            if reused:
+                # The server closed an idle keep-alive connection; retry once
+                # on a fresh one.
+                continue
+            return failure(None, str(exc))
+        except (OSError, http.client.HTTPException) as exc:
+            _drop_connection()
+            return failure(None, str(exc))
+        break
+
+    if response.will_close:
+        _drop_connection()
+
+    if status >= 400:
+        return failure(status, body.decode("utf-8", "replace").strip())
+
     duration = time.perf_counter() - start
-    digest = sha256(body).hexdigest() if body else None
+    digest = blake2b(memoryview(body), digest_size=16).hexdigest() if body else None
     return RequestResult(
         index=plan.index,
         prompt=plan.prompt,
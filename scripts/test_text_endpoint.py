@@ -8,7 +8,7 @@ import sys
 import time
 import urllib.error
 import urllib.request
-from hashlib import sha256
+from hashlib import blake2b
 
 
 def run(url: str, prompt: str, seed: int, timeout: float, output: pathlib.Path) -> int:
@@ -45,10 +45,10 @@ def run(url: str, prompt: str, seed: int, timeout: float, output: pathlib.Path)
         return 1
 
     elapsed = time.perf_counter() - start
-    digest = sha256(body).hexdigest()
+    digest = blake2b(memoryview(body), digest_size=16).hexdigest()
 
     print(f"HTTP {status} in {elapsed:.2f}s")
-    print(f"Response bytes: {len(body)} (sha256 {digest})")
+    print(f"Response bytes: {len(body)} (blake2b {digest})")
     if headers.get("content-type"):
         print(f"Content-Type: {headers['content-type']}")
 
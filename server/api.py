@@ -1,37 +1,125 @@
 # server/api.py
-import io
-import base64
+import asyncio
+import fcntl
+import hashlib
+import hmac
+import os
+import threading
+from typing import Optional
+try:
+    import pybase64 as base64  # SIMD (AVX2/NEON) encoder, same API as stdlib
+except ImportError:  # pragma: no cover - optional speedup
+    import base64
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi import Body
-from fastapi.responses import StreamingResponse
-from PIL import Image
+from fastapi import Body, Header
+from fastapi.responses import Response, StreamingResponse
 from .model_manager import manager
+from .utils import load_image
 
 router = APIRouter()
 
+GLB_CHUNK_SIZE = 1 << 20
+
+# When set (e.g. /dev/shm/trellis), GLBs are written there and nginx is told to
+# send them itself via X-Accel-Redirect, so the worker never copies the payload
+# to the socket. Only the newest ACCEL_MAX_FILES files (by mtime) are kept.
+ACCEL_DIR = os.environ.get("TRELLIS_ACCEL_DIR")
+ACCEL_PREFIX = os.environ.get("TRELLIS_ACCEL_PREFIX", "/_glb/")
+ACCEL_MAX_FILES = int(os.environ.get("TRELLIS_ACCEL_MAX_FILES", "64"))
+
+# /admin/* routes are disabled unless a token is configured, because the default
+# nginx site in server/deploy proxies every path to the public internet.
+ADMIN_TOKEN = os.environ.get("TRELLIS_ADMIN_TOKEN")
+
+
+async def _iter_chunks(data: bytes, chunk_size: int = GLB_CHUNK_SIZE):
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def _publish_glb(glb_bytes: bytes) -> str:
+    # Content-addressed, so a repeated (e.g. cached) result reuses its file.
+    name = hashlib.blake2b(glb_bytes, digest_size=16).hexdigest() + ".glb"
+    path = os.path.join(ACCEL_DIR, name)
+    os.makedirs(ACCEL_DIR, exist_ok=True)
+    # The lock file is shared by every uvicorn worker process (and each call
+    # opens its own descriptor, so it also excludes threads). Publishing and
+    # eviction both happen under it, so nobody can evict a file another
+    # request has just been handed.
+    with open(os.path.join(ACCEL_DIR, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            os.utime(path)  # reuse counts as newest
+        except FileNotFoundError:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(glb_bytes)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            os.replace(tmp, path)
+        _evict_accel_files()
+    return name
+
+
+def _evict_accel_files() -> None:
+    # Scans the directory rather than tracking names in memory, so files left
+    # behind by earlier runs or other workers are evicted too. Any *.tmp seen
+    # under the lock is a leftover from a crashed write.
+    with os.scandir(ACCEL_DIR) as it:
+        entries = [entry for entry in it if entry.name.endswith((".glb", ".tmp"))]
+    glbs = []
+    for entry in entries:
+        try:
+            if entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+            else:
+                glbs.append((entry.stat().st_mtime_ns, entry.path))
+        except FileNotFoundError:
+            pass
+    glbs.sort()
+    for _, old_path in glbs[:max(len(glbs) - ACCEL_MAX_FILES, 0)]:
+        try:
+            os.unlink(old_path)
+        except FileNotFoundError:
+            pass
+
+
+async def _glb_response(glb_bytes: bytes) -> Response:
+    headers = {"Content-Disposition": 'attachment; filename="output.glb"'}
+    if ACCEL_DIR:
+        name = await asyncio.to_thread(_publish_glb, glb_bytes)
+        headers["X-Accel-Redirect"] = ACCEL_PREFIX + name
+        return Response(media_type="model/gltf-binary", headers=headers)
+    if len(glb_bytes) <= GLB_CHUNK_SIZE:
+        return Response(content=glb_bytes, media_type="model/gltf-binary", headers=headers)
+    # One big write makes the transport copy whatever the socket does not take
+    # immediately, doubling RSS for slow clients. Streaming zero-copy slices
+    # waits for each chunk to drain instead.
+    headers["Content-Length"] = str(len(glb_bytes))
+    return StreamingResponse(_iter_chunks(glb_bytes), media_type="model/gltf-binary", headers=headers)
+
+
 @router.post("/generate_mesh_b64")
 async def generate_mesh_b64(file: UploadFile = File(...), seed: int = 1):
     try:
-        data = await file.read()
-        image = Image.open(io.BytesIO(data)).convert("RGB")
+        image = await asyncio.to_thread(load_image, file.file)
     except Exception:
         raise HTTPException(status_code=400, detail="invalid image")
     glb_bytes = await manager.generate_glb_bytes_async(image, seed=seed)
-    return {"glb_b64": base64.b64encode(glb_bytes).decode("utf-8")}
+    return {"glb_b64": base64.b64encode(memoryview(glb_bytes)).decode("ascii")}
 
 @router.post("/generate_mesh_file")
 async def generate_mesh_file(file: UploadFile = File(...), seed: int = 1):
     try:
-        data = await file.read()
-        image = Image.open(io.BytesIO(data)).convert("RGB")
+        image = await asyncio.to_thread(load_image, file.file)
     except Exception:
         raise HTTPException(status_code=400, detail="invalid image")
     glb_bytes = await manager.generate_glb_bytes_async(image, seed=seed)
-    return StreamingResponse(
-        io.BytesIO(glb_bytes),
-        media_type="model/gltf-binary",
-        headers={"Content-Disposition": 'attachment; filename="output.glb"'},
-    )
+    return await _glb_response(glb_bytes)
 
 
 @router.post("/generate_mesh_from_text")
@@ -44,8 +132,17 @@ async def generate_mesh_from_text(
         raise HTTPException(status_code=400, detail="missing prompt")
 
     glb_bytes = await manager.generate_glb_bytes_from_text_async(prompt, seed=seed)
-    return StreamingResponse(
-        io.BytesIO(glb_bytes),
-        media_type="model/gltf-binary",
-        headers={"Content-Disposition": 'attachment; filename="output.glb"'},
-    )
+    return await _glb_response(glb_bytes)
+
+
+def _check_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+
+@router.post("/admin/empty_cache")
+async def empty_cache(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return await manager.empty_cache()
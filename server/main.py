@@ -1,14 +1,24 @@
 # server/main.py
+import hashlib
 import os
+import re
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
+from prometheus_fastapi_instrumentator import Instrumentator
 
 os.environ.setdefault("ATTN_BACKEND", "xformers")
 os.environ.setdefault("SPCONV_ALGO", "native")
+# Let the caching allocator grow segments in place instead of cudaFree/cudaMalloc
+# churn between the sparse structure, SLat and texture stages.
+os.environ.setdefault(
+    "PYTORCH_CUDA_ALLOC_CONF",
+    "expandable_segments:True,max_split_size_mb:512,garbage_collection_threshold:0.8",
+)
 
 from .model_manager import manager
 from .api import router as api_router
+from .middleware import CompressionMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,7 +29,12 @@ async def lifespan(app: FastAPI):
         await manager.unload()
 
 app = FastAPI(title="Trellis Mesh API", lifespan=lifespan)
+# GLB geometry buffers and base64 payloads compress well. zstd is preferred over
+# gzip when the client's Accept-Encoding q-values tie.
+app.add_middleware(CompressionMiddleware, minimum_size=1024, gzip_level=5, zstd_level=3)
 app.include_router(api_router)
+# Request metrics plus the trellis_* stage histograms from server/metrics.py.
+Instrumentator().instrument(app).expose(app, endpoint="/metrics")
 
 DOC_PAGE_HTML = """
 <!DOCTYPE html>
@@ -262,11 +277,33 @@ DOC_PAGE_HTML = """
 </html>
 """
 
+# Encoded once at import; the ETag lets browsers revalidate instead of refetching.
+DOC_PAGE_BYTES = DOC_PAGE_HTML.encode("utf-8")
+# Weak, since the compression middleware may serve the same page gzip- or
+# zstd-encoded; a strong validator would have to differ per encoding.
+DOC_PAGE_ETAG = 'W/"' + hashlib.blake2b(DOC_PAGE_BYTES, digest_size=8).hexdigest() + '"'
+DOC_PAGE_HEADERS = {
+    "ETag": DOC_PAGE_ETAG,
+    "Cache-Control": "public, max-age=3600",
+    "Vary": "Accept-Encoding",
+}
+_ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def _if_none_match(header: str, etag: str) -> bool:
+    """RFC 9110 If-None-Match: "*" or any listed tag, compared weakly."""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(tag.endswith(opaque) for tag in _ENTITY_TAG.findall(header))
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
 @app.get("/doc", response_class=HTMLResponse)
-async def doc_page():
-    return HTMLResponse(DOC_PAGE_HTML)
+async def doc_page(request: Request):
+    if _if_none_match(request.headers.get("if-none-match", ""), DOC_PAGE_ETAG):
+        return Response(status_code=304, headers=DOC_PAGE_HEADERS)
+    return Response(DOC_PAGE_BYTES, media_type="text/html; charset=utf-8", headers=DOC_PAGE_HEADERS)
@@ -0,0 +1,56 @@
+# server/metrics.py
+import contextlib
+import threading
+import time
+from typing import Iterator
+
+import torch
+from prometheus_client import Histogram
+
+STAGE_SECONDS = Histogram(
+    "trellis_stage_seconds",
+    "Time spent in each mesh generation stage",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+TEXT_BATCH_SIZE = Histogram(
+    "trellis_text_batch_size",
+    "Number of prompts sampled together in one text diffusion pass",
+    buckets=(1, 2, 3, 4, 6, 8, 16),
+)
+
+
+@contextlib.contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block into trellis_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    yield
+    STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+class StreamStage:
+    """A stage timed by CUDA events on a stream, without a host sync.
+
+    `end` doubles as the readiness event consumers wait on. observe() must only
+    be called once `end` has completed (e.g. after a stream that waited on it
+    was synchronized); batches share one StreamStage, so only the first call
+    records a sample.
+    """
+
+    def __init__(self, stage: str, stream: torch.cuda.Stream) -> None:
+        self.stage = stage
+        self.start = torch.cuda.Event(enable_timing=True)
+        self.end = torch.cuda.Event(enable_timing=True)
+        self.start.record(stream)
+        self._lock = threading.Lock()
+        self._observed = False
+
+    def stop(self, stream: torch.cuda.Stream) -> None:
+        self.end.record(stream)
+
+    def observe(self) -> None:
+        with self._lock:
+            if self._observed:
+                return
+            self._observed = True
+        STAGE_SECONDS.labels(stage=self.stage).observe(self.start.elapsed_time(self.end) / 1000)
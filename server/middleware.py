@@ -0,0 +1,178 @@
+# server/middleware.py
+import asyncio
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional, gzip still applies
+    zstandard = None
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Chunks at least this large are compressed on a worker thread so multi-MB
+# bodies (GLBs, /doc) do not stall the event loop.
+OFFLOAD_SIZE = 64 * 1024
+
+
+def choose_encoding(accept_encoding: str, available: tuple) -> Optional[str]:
+    """Pick the best of `available` (in server preference order) by q-value.
+
+    Codings the client gave q=0, or left out with no "*" entry, are never
+    picked; a tie goes to the earlier entry in `available`.
+    """
+    prefs = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        prefs[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = prefs.get(encoding, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _add_vary(headers: MutableHeaders, token: str) -> None:
+    # MutableHeaders.add_vary_header appends unconditionally, which would repeat
+    # a token the app already set (e.g. /doc's Vary: Accept-Encoding).
+    present = {value.strip().lower() for value in headers.get("vary", "").split(",")}
+    if token.lower() not in present:
+        headers.add_vary_header(token)
+
+
+def _compressobj(encoding: str, gzip_level: int, zstd_level: int):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compressobj()
+    return zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd or gzip, following the client's q-values.
+
+    Replaces Starlette's GZipMiddleware, which compresses on the event loop;
+    chunks of OFFLOAD_SIZE or more go through asyncio.to_thread instead.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.available = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get("accept-encoding", ""), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app, self.minimum_size, encoding, self.gzip_level, self.zstd_level
+        )
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(
+        self, app: ASGIApp, minimum_size: int, encoding: str, gzip_level: int, zstd_level: int
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.send: Send = _unattached_send
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def _compress(self, body: bytes, finish: bool) -> bytes:
+        if len(body) >= OFFLOAD_SIZE:
+            return await asyncio.to_thread(self._compress_sync, body, finish)
+        return self._compress_sync(body, finish)
+
+    def _compress_sync(self, body: bytes, finish: bool) -> bytes:
+        chunk = self.compressor.compress(body)
+        if finish:
+            chunk += self.compressor.flush()
+        return chunk
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk tells us whether to compress.
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or headers.get(
+                "content-type", ""
+            ).startswith("text/event-stream")
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if not self.passthrough and not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+            if self.passthrough:
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            _add_vary(headers, "Accept-Encoding")
+            self.compressor = _compressobj(self.encoding, self.gzip_level, self.zstd_level)
+            if not more_body:
+                compressed = await self._compress(body, finish=True)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            del headers["Content-Length"]
+            await self.send(self.initial_message)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        chunk = await self._compress(body, finish=not more_body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+async def _unattached_send(message: Message) -> None:  # pragma: no cover
+    raise RuntimeError("send awaitable not set")
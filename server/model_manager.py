@@ -1,10 +1,20 @@
 import asyncio
+import collections
+import contextlib
+import hashlib
+import logging
 import os
+import pathlib
 import sys
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
 
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageDraw
+import rembg
 import torch
+from torchvision.transforms.v2 import functional as TF
 
 # Point to your local TRELLIS source tree
 TRELLIS_SRC = os.environ.get("TRELLIS_SRC", "/tmp/TRELLIS/TRELLIS")
@@ -15,82 +25,550 @@ if TRELLIS_SRC not in sys.path:
 # PYTHONPATH and editable install will make this import work there
 from trellis.pipelines import TrellisImageTo3DPipeline
 from trellis.pipelines import TrellisTextTo3DPipeline
+from trellis.modules import sparse as sp
 from trellis.utils import postprocessing_utils
 
+from .metrics import TEXT_BATCH_SIZE, StreamStage, observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Concurrent text requests are coalesced into one diffusion pass of up to this
+# many prompts, waiting at most TEXT_BATCH_WINDOW seconds for the batch to fill.
+TEXT_MAX_BATCH = int(os.environ.get("TRELLIS_TEXT_MAX_BATCH", "4"))
+TEXT_BATCH_WINDOW = float(os.environ.get("TRELLIS_TEXT_BATCH_WINDOW_MS", "50")) / 1000
+
+# Text generations are deterministic in (prompt, seed, simplify, texture_size),
+# so finished GLBs are kept in an in-memory LRU and, if a directory is given,
+# on disk so they survive restarts.
+TEXT_CACHE_SIZE = int(os.environ.get("TRELLIS_TEXT_CACHE_SIZE", "64"))
+TEXT_CACHE_DIR = os.environ.get("TRELLIS_TEXT_CACHE_DIR")
+
+# torch.compile the dense sparse-structure flow transformer of both pipelines and
+# warm them up at startup. The SLat flow model is left eager because its sparse
+# voxel count changes with every sample. reduce-overhead (CUDA graphs) is not the
+# default because classifier-free guidance calls the model twice per step and
+# the graph's output buffer is reused between those calls.
+COMPILE = os.environ.get("TRELLIS_COMPILE", "0") == "1"
+COMPILE_MODE = os.environ.get("TRELLIS_COMPILE_MODE", "default")
+COMPILED_MODELS = ("sparse_structure_flow_model",)
+
+# The flow transformers carry most of the FLOPs. TRELLIS models already have a
+# use_fp16 path (fp16 weights for attention/MLP blocks, fp32 norms), so switch
+# it on for any checkpoint that ships with it disabled. TRELLIS_AUTOCAST can
+# additionally run the flow sampling under torch.autocast ("bfloat16" or
+# "float16"); decoding stays fp32. It is off by default because spconv kernels
+# vary in half support.
+HALF_FLOW_MODELS = os.environ.get("TRELLIS_HALF_FLOW_MODELS", "1") == "1"
+FLOW_MODELS = ("sparse_structure_flow_model", "slat_flow_model")
+AUTOCAST_DTYPE = {"bfloat16": torch.bfloat16, "float16": torch.float16}.get(
+    os.environ.get("TRELLIS_AUTOCAST", "")
+)
+
+# to_glb (simplification, UV unwrap, texture baking) and GLB export run on this
+# many threads, overlapping with the next request's diffusion on the GPU.
+POST_WORKERS = 2
+# Finished samples waiting for a post thread hold VRAM, so their number is
+# bounded; the bound leaves room for a whole text batch on top of the samples
+# already being post-processed, so dispatching a batch never stalls the worker.
+POST_SLOTS = POST_WORKERS + max(TEXT_MAX_BATCH, 1)
+# Background removal (rembg on onnxruntime) already spreads one image over every
+# core, so uploads are preprocessed on this many threads rather than on the
+# unbounded default to_thread pool.
+PREPROCESS_WORKERS = 1
+
+
+def _pixels_to_unit(pixels: torch.Tensor) -> torch.Tensor:
+    # HWC uint8 -> 1xCxHxW float32 in [0, 1], the tensor layout encode_image takes.
+    return TF.to_dtype(pixels.permute(2, 0, 1).unsqueeze(0), torch.float32, scale=True)
+
+
+def _use_half_flow_models(pipe) -> None:
+    for name in FLOW_MODELS:
+        model = pipe.models.get(name)
+        if model is None or getattr(model, "use_fp16", True) or not hasattr(model, "convert_to_fp16"):
+            continue
+        model.convert_to_fp16()
+        model.use_fp16 = True
+        model.dtype = torch.float16
+
 
 class ModelManager:
     def __init__(self):
         self.img_pipe: Optional[TrellisImageTo3DPipeline] = None
         self.txt_pipe: Optional[TrellisTextTo3DPipeline] = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self._lock: Optional[asyncio.Lock] = None
+        # Every GPU job goes through this queue and is sampled one at a time by
+        # _worker on a single dedicated thread and CUDA stream. Post-processing
+        # is handed to _post_executor so the worker can start the next job.
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._gpu_executor: Optional[ThreadPoolExecutor] = None
+        self._post_executor: Optional[ThreadPoolExecutor] = None
+        self._preprocess_executor: Optional[ThreadPoolExecutor] = None
+        self._post_slots: Optional[asyncio.Semaphore] = None
+        self._post_tasks: set = set()
+        self._stream: Optional[torch.cuda.Stream] = None
+        self._pixels_to_unit: Callable[[torch.Tensor], torch.Tensor] = _pixels_to_unit
+        self._text_cache: "collections.OrderedDict[str, bytes]" = collections.OrderedDict()
+        self._text_cache_dir = pathlib.Path(TEXT_CACHE_DIR) if TEXT_CACHE_DIR else None
 
     async def load(self):
-        if self._lock is None:
-            self._lock = asyncio.Lock()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trellis-gpu")
+            self._post_executor = ThreadPoolExecutor(max_workers=POST_WORKERS, thread_name_prefix="trellis-post")
+            self._preprocess_executor = ThreadPoolExecutor(
+                max_workers=PREPROCESS_WORKERS, thread_name_prefix="trellis-preprocess"
+            )
+            self._post_slots = asyncio.Semaphore(POST_SLOTS)
+            if self.device == "cuda":
+                self._stream = torch.cuda.Stream()
+            self._worker_task = asyncio.create_task(self._worker())
 
         if self.img_pipe is None or self.txt_pipe is None:
-            loop = asyncio.get_running_loop()
-
             def _load_image():
                 p = TrellisImageTo3DPipeline.from_pretrained("microsoft/TRELLIS-image-large")
+                # preprocess_image creates this lazily, which concurrent first
+                # requests would race on, each building its own u2net session.
+                p.rembg_session = rembg.new_session("u2net")
                 if self.device == "cuda":
                     p.cuda()
+                    if HALF_FLOW_MODELS:
+                        _use_half_flow_models(p)
                 return p
 
             def _load_text():
                 p = TrellisTextTo3DPipeline.from_pretrained("microsoft/TRELLIS-text-base")
                 if self.device == "cuda":
                     p.cuda()
+                    if HALF_FLOW_MODELS:
+                        _use_half_flow_models(p)
                 return p
 
-            img_fut = loop.run_in_executor(None, _load_image)
-            txt_fut = loop.run_in_executor(None, _load_text)
-            self.img_pipe, self.txt_pipe = await asyncio.gather(img_fut, txt_fut)
+            self.img_pipe, self.txt_pipe = await asyncio.gather(
+                asyncio.to_thread(_load_image),
+                asyncio.to_thread(_load_text),
+            )
+            if self.device == "cuda":
+                # Shapes are fixed per stage, so cuDNN autotuning pays off after
+                # the first request.
+                torch.backends.cudnn.benchmark = True
+                torch.set_float32_matmul_precision("high")
+                if COMPILE:
+                    for pipe in (self.img_pipe, self.txt_pipe):
+                        for name in COMPILED_MODELS:
+                            pipe.models[name] = torch.compile(pipe.models[name], mode=COMPILE_MODE)
+                    self._pixels_to_unit = torch.compile(_pixels_to_unit, fullgraph=True)
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(self._gpu_executor, self._run_warmup)
+                    print(f"Trellis flow models compiled ({COMPILE_MODE}) and warmed up")
             print("Trellis pipelines loaded (image+text)")
 
     async def unload(self):
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker_task
+            self._worker_task = None
+        if self._post_tasks:
+            await asyncio.gather(*self._post_tasks, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                *_, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Model manager shut down"))
+            self._queue = None
+        for executor in (self._gpu_executor, self._post_executor, self._preprocess_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._gpu_executor = None
+        self._post_executor = None
+        self._preprocess_executor = None
+        self._post_slots = None
+        self._stream = None
         self.img_pipe = None
         self.txt_pipe = None
-        torch.cuda.empty_cache()
-        self._lock = None
         print("Trellis pipelines unloaded")
 
-    def _to_glb_bytes(self, outputs, simplify: float = 0.95, texture_size: int = 1024) -> bytes:
-        glb = postprocessing_utils.to_glb(
-            outputs["gaussian"][0],
-            outputs["mesh"][0],
-            simplify=simplify,
-            texture_size=texture_size,
-        )
-        return glb.export(file_type="glb")
-
-    def generate_glb_bytes(
+    def _inference_context(self):
+        # no_grad rather than inference_mode, matching TRELLIS's own run(): the
+        # outputs feed to_glb, whose Gaussian renderer records autograd history
+        # and cannot save inference tensors for backward.
+        return torch.no_grad()
+
+    def _autocast_context(self):
+        # Only the flow sampling runs under autocast. The decoders feed the
+        # Gaussian rasterizer and FlexiCubes in to_glb, which expect fp32.
+        if AUTOCAST_DTYPE is None or self.device != "cuda":
+            return contextlib.nullcontext()
+        return torch.autocast("cuda", dtype=AUTOCAST_DTYPE)
+
+    @staticmethod
+    def _fp32_slat(slat):
+        if slat.feats.dtype == torch.float32:
+            return slat
+        return slat.replace(slat.feats.float())
+
+    def _stream_context(self):
+        if self._stream is None:
+            return contextlib.nullcontext()
+        return torch.cuda.stream(self._stream)
+
+    def _run_gpu_stage(self, fn: Callable[..., Any], *args: Any) -> Tuple[Any, Optional[StreamStage]]:
+        # The current stream is thread local, so select it inside the GPU thread.
+        with self._stream_context():
+            if self._stream is None:
+                with observe_stage("diffusion"):
+                    return fn(*args), None
+            # Timed with events on the stream instead of a host sync; the post
+            # stage reads the elapsed time once it has waited on ready.end anyway.
+            ready = StreamStage("diffusion", self._stream)
+            outputs = fn(*args)
+            ready.stop(self._stream)
+        return outputs, ready
+
+    def _run_warmup(self) -> None:
+        # Kept out of _run_gpu_stage so compile time is not recorded as a
+        # diffusion sample.
+        with self._stream_context():
+            self._warmup()
+        if self._stream is not None:
+            self._stream.synchronize()
+
+    def _run_post_stage(
         self,
-        image: Image.Image,
-        seed: int = 1,
-        simplify: float = 0.95,
-        texture_size: int = 1024,
+        outputs: dict,
+        ready: Optional[StreamStage],
+        simplify: float,
+        texture_size: int,
     ) -> bytes:
+        if ready is None:
+            return self._to_glb_bytes(outputs, simplify=simplify, texture_size=texture_size)
+        # Post-processing stays on the legacy default stream: the rasterizer used
+        # for texture baking launches its kernels there whatever the current torch
+        # stream is. The diffusion stream is non-blocking, so the two still overlap.
+        post_stream = torch.cuda.default_stream()
+        post_stream.wait_event(ready.end)
+        try:
+            return self._to_glb_bytes(outputs, simplify=simplify, texture_size=texture_size)
+        finally:
+            # The outputs were allocated on the GPU stream, which may reuse
+            # their blocks as soon as they are freed. Drain this stream first
+            # so none of its kernels still reads them.
+            post_stream.synchronize()
+            ready.observe()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        carry = None
+        while True:
+            job = carry if carry is not None else await self._queue.get()
+            carry = None
+            try:
+                if job[0] == self._sample_text and TEXT_MAX_BATCH > 1:
+                    jobs, carry = await self._collect_text_batch(job)
+                    await self._run_text_jobs(loop, jobs)
+                else:
+                    await self._run_job(loop, job)
+            except asyncio.CancelledError:
+                if carry is not None:
+                    carry[-1].cancel()
+                raise
+
+    async def _finish(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        outputs: dict,
+        ready: Optional[StreamStage],
+        post_args: Tuple,
+        future: asyncio.Future,
+    ) -> None:
+        try:
+            glb_bytes = await loop.run_in_executor(self._post_executor, self._run_post_stage, outputs, ready, *post_args)
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+        else:
+            if not future.done():
+                future.set_result(glb_bytes)
+        finally:
+            self._post_slots.release()
+
+    async def _start_post(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        outputs: dict,
+        ready: Optional[StreamStage],
+        post_args: Tuple,
+        future: asyncio.Future,
+    ) -> None:
+        # Bounded (POST_SLOTS) so finished samples cannot pile up in VRAM faster
+        # than post-processing drains them.
+        try:
+            await self._post_slots.acquire()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        task = asyncio.create_task(self._finish(loop, outputs, ready, post_args, future))
+        self._post_tasks.add(task)
+        task.add_done_callback(self._post_tasks.discard)
+
+    async def _run_job(self, loop: asyncio.AbstractEventLoop, job: Tuple) -> None:
+        fn, args, post_args, future = job
+        if future.cancelled():
+            return
+        try:
+            outputs, ready = await loop.run_in_executor(self._gpu_executor, self._run_gpu_stage, fn, *args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+            return
+        await self._start_post(loop, outputs, ready, post_args, future)
+
+    async def _collect_text_batch(self, first: Tuple) -> Tuple[List[Tuple], Optional[Tuple]]:
+        # Returns the batch plus the first non-text job pulled off the queue while
+        # waiting, which the worker must run next to keep FIFO order.
+        loop = asyncio.get_running_loop()
+        jobs = [first]
+        deadline = loop.time() + TEXT_BATCH_WINDOW
+        while len(jobs) < TEXT_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if job[0] != first[0]:
+                return jobs, job
+            jobs.append(job)
+        return jobs, None
+
+    async def _run_text_jobs(self, loop: asyncio.AbstractEventLoop, jobs: List[Tuple]) -> None:
+        jobs = [job for job in jobs if not job[-1].cancelled()]
+        if not jobs:
+            return
+        TEXT_BATCH_SIZE.observe(len(jobs))
+        if len(jobs) == 1:
+            await self._run_job(loop, jobs[0])
+            return
+
+        prompts = [args[0] for _, args, _, _ in jobs]
+        seeds = [args[1] for _, args, _, _ in jobs]
+        try:
+            batch_outputs, ready = await loop.run_in_executor(
+                self._gpu_executor, self._run_gpu_stage, self._sample_text_batch, prompts, seeds
+            )
+        except asyncio.CancelledError:
+            for *_, future in jobs:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for *_, future in jobs:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for outputs, (_, _, post_args, future) in zip(batch_outputs, jobs):
+            await self._start_post(loop, outputs, ready, post_args, future)
+
+    async def _submit(self, fn: Callable[..., Any], args: Tuple, post_args: Tuple) -> bytes:
+        if self._queue is None:
+            raise RuntimeError("Model manager not initialized")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, args, post_args, future))
+        return await future
+
+    def _empty_cache(self) -> dict:
+        if self.device != "cuda":
+            return {"reserved_before": 0, "reserved_after": 0}
+        reserved_before = torch.cuda.memory_reserved()
+        torch.cuda.empty_cache()
+        return {"reserved_before": reserved_before, "reserved_after": torch.cuda.memory_reserved()}
+
+    async def empty_cache(self) -> dict:
+        # Releasing cached blocks syncs the device and the next request pays for
+        # fresh cudaMalloc calls, so this is only exposed as an admin action. It
+        # runs on the GPU thread, after whatever diffusion is in flight, rather
+        # than blocking the event loop on that sync.
+        if self._gpu_executor is None:
+            return await asyncio.to_thread(self._empty_cache)
+        return await asyncio.get_running_loop().run_in_executor(self._gpu_executor, self._empty_cache)
+
+    def _to_glb_bytes(self, outputs, simplify: float = 0.95, texture_size: int = 1024) -> bytes:
+        # to_glb covers mesh simplification, UV unwrapping and texture baking.
+        with observe_stage("to_glb"):
+            glb = postprocessing_utils.to_glb(
+                outputs["gaussian"][0],
+                outputs["mesh"][0],
+                simplify=simplify,
+                texture_size=texture_size,
+            )
+        with observe_stage("export"):
+            return glb.export(file_type="glb")
+
+    def _warmup(self) -> None:
+        # An RGBA input with a real alpha channel skips background removal.
+        image = Image.new("RGBA", (518, 518), (0, 0, 0, 0))
+        ImageDraw.Draw(image).rectangle((130, 130, 388, 388), fill=(200, 200, 200, 255))
+        self._sample_image(self._to_pixels(self.img_pipe.preprocess_image(image)), seed=0)
+        self._sample_text("a wooden chair", seed=0)
+        if TEXT_MAX_BATCH > 1:
+            # A second batch size makes torch.compile treat the batch dimension
+            # as dynamic, so coalesced batches of 2..TEXT_MAX_BATCH prompts reuse
+            # that graph instead of recompiling inside a live request.
+            self._sample_text_batch(["a wooden chair"] * TEXT_MAX_BATCH, list(range(TEXT_MAX_BATCH)))
+
+    def _prepare_image(self, image: Image.Image) -> torch.Tensor:
+        # Background removal and cropping are CPU work, so they run on the
+        # preprocessing executor rather than the GPU worker. The 518x518 result is kept
+        # as uint8 in pinned memory, a quarter of the bytes of the float tensor
+        # TRELLIS would otherwise build and copy synchronously.
         if self.img_pipe is None:
             raise RuntimeError("Image pipeline not loaded")
 
-        outputs = self.img_pipe.run(image, seed=seed)
-        return self._to_glb_bytes(outputs, simplify=simplify, texture_size=texture_size)
+        with observe_stage("preprocess"):
+            image = self.img_pipe.preprocess_image(image)
+        return self._to_pixels(image)
 
-    def generate_glb_bytes_from_text(
-        self,
-        prompt: str,
-        seed: int = 1,
-        simplify: float = 0.95,
-        texture_size: int = 1024,
-    ) -> bytes:
+    def _to_pixels(self, image: Image.Image) -> torch.Tensor:
+        pixels = torch.from_numpy(np.array(image.convert("RGB")))
+        if self.device == "cuda":
+            pixels = pixels.pin_memory()
+        return pixels
+
+    def _sample_image(self, pixels: torch.Tensor, seed: int = 1) -> dict:
+        # Same stages as TrellisImageTo3DPipeline.run(preprocess_image=False),
+        # fed with the tensor from _prepare_image.
+        if self.img_pipe is None:
+            raise RuntimeError("Image pipeline not loaded")
+
+        pipe = self.img_pipe
+        with self._inference_context():
+            pixels = pixels.to(pipe.device, non_blocking=True)
+            pixels = self._pixels_to_unit(pixels)
+            cond = pipe.get_cond(pixels)
+            return self._sample_from_cond(pipe, cond, [torch.Generator().manual_seed(seed)])
+
+    def _sample_text(self, prompt: str, seed: int = 1) -> dict:
+        # A batch of one through the batched path, so a prompt's result cannot
+        # depend on whether the worker coalesced it with others (the text cache
+        # relies on that). Its seeded generator draws the same noise as
+        # torch.manual_seed(seed) in TrellisTextTo3DPipeline.run.
+        return self._sample_text_batch([prompt], [seed])[0]
+
+    def _sample_text_batch(self, prompts: List[str], seeds: List[int]) -> List[dict]:
+        # Same stages as TrellisTextTo3DPipeline.run, but the text encoder and both
+        # flow models see every prompt at once. Each prompt draws its noise from
+        # its own generator, so its result still depends only on (prompt, seed).
         if self.txt_pipe is None:
             raise RuntimeError("Text pipeline not loaded")
 
-        outputs = self.txt_pipe.run(prompt, seed=seed)
-        return self._to_glb_bytes(outputs, simplify=simplify, texture_size=texture_size)
+        pipe = self.txt_pipe
+        batch = len(prompts)
+        generators = [torch.Generator().manual_seed(seed) for seed in seeds]
+        with self._inference_context():
+            cond = pipe.get_cond(prompts)
+            neg_cond = cond["neg_cond"]
+            cond["neg_cond"] = neg_cond.expand(batch, *neg_cond.shape[1:])
+            decoded = self._sample_from_cond(pipe, cond, generators)
+
+        return [{"gaussian": [decoded["gaussian"][i]], "mesh": [decoded["mesh"][i]]} for i in range(batch)]
+
+    def _sample_from_cond(self, pipe, cond: dict, generators: List[torch.Generator]) -> dict:
+        # sample_sparse_structure, sample_slat and decode_slat of the TRELLIS
+        # pipelines, with one seeded generator per batch item (drawing what
+        # torch.manual_seed(seed) would for that item alone). Autocast covers
+        # the two flow samplers only; both decoders run in fp32, so occupancy
+        # does not depend on TRELLIS_AUTOCAST or on the batch size.
+        batch = len(generators)
+        flow_model = pipe.models["sparse_structure_flow_model"]
+        reso = flow_model.resolution
+        noise = torch.cat(
+            [torch.randn(1, flow_model.in_channels, reso, reso, reso, generator=g) for g in generators]
+        ).to(pipe.device)
+        with self._autocast_context():
+            z_s = pipe.sparse_structure_sampler.sample(
+                flow_model, noise, **cond, **pipe.sparse_structure_sampler_params, verbose=False
+            ).samples
+        decoder = pipe.models["sparse_structure_decoder"]
+        coords = torch.argwhere(decoder(z_s.float()) > 0)[:, [0, 2, 3, 4]].int()
+
+        # argwhere yields coords grouped by batch index, so per-item feature
+        # noise can simply be concatenated in order.
+        flow_model = pipe.models["slat_flow_model"]
+        counts = torch.bincount(coords[:, 0], minlength=batch).tolist()
+        feats = torch.cat(
+            [torch.randn(n, flow_model.in_channels, generator=g) for n, g in zip(counts, generators)]
+        ).to(pipe.device)
+        with self._autocast_context():
+            slat = pipe.slat_sampler.sample(
+                flow_model, sp.SparseTensor(feats=feats, coords=coords), **cond, **pipe.slat_sampler_params, verbose=False
+            ).samples
+        slat = self._fp32_slat(slat)
+        std = torch.tensor(pipe.slat_normalization["std"])[None].to(slat.device)
+        mean = torch.tensor(pipe.slat_normalization["mean"])[None].to(slat.device)
+        return pipe.decode_slat(slat * std + mean, ["gaussian", "mesh"])
+
+    @staticmethod
+    def text_cache_key(prompt: str, seed: int, simplify: float, texture_size: int) -> str:
+        # The prompt goes last so a "|" inside it cannot collide with another key.
+        key = f"{seed}|{simplify!r}|{texture_size}|{prompt}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
+    def _read_cached_text(self, key: str) -> Optional[bytes]:
+        if self._text_cache_dir is None:
+            return None
+        path = self._text_cache_dir / f"{key}.glb"
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("Text cache read failed for %s: %s", path, exc)
+            return None
+
+    def _write_cached_text(self, key: str, glb_bytes: bytes) -> None:
+        # The disk copy is best effort: a full or unwritable cache directory must
+        # not turn a finished generation into an error.
+        if self._text_cache_dir is None:
+            return
+        path = self._text_cache_dir / f"{key}.glb"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self._text_cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(glb_bytes)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("Text cache write failed for %s: %s", path, exc)
+            with contextlib.suppress(OSError):
+                tmp.unlink()
+
+    def _remember_text(self, key: str, glb_bytes: bytes) -> None:
+        if TEXT_CACHE_SIZE <= 0:
+            return
+        self._text_cache[key] = glb_bytes
+        self._text_cache.move_to_end(key)
+        while len(self._text_cache) > TEXT_CACHE_SIZE:
+            self._text_cache.popitem(last=False)
+
+    async def _cached_text(self, key: str) -> Optional[bytes]:
+        glb_bytes = self._text_cache.get(key)
+        if glb_bytes is not None:
+            self._text_cache.move_to_end(key)
+            return glb_bytes
+        glb_bytes = await asyncio.to_thread(self._read_cached_text, key)
+        if glb_bytes is not None:
+            self._remember_text(key, glb_bytes)
+        return glb_bytes
+
+    async def _store_text(self, key: str, glb_bytes: bytes) -> None:
+        self._remember_text(key, glb_bytes)
+        await asyncio.to_thread(self._write_cached_text, key, glb_bytes)
 
     async def generate_glb_bytes_async(
         self,
@@ -99,17 +577,11 @@ class ModelManager:
         simplify: float = 0.95,
         texture_size: int = 1024,
     ) -> bytes:
-        if self._lock is None:
+        if self._preprocess_executor is None:
             raise RuntimeError("Model manager not initialized")
-
-        async with self._lock:
-            return await asyncio.to_thread(
-                self.generate_glb_bytes,
-                image,
-                seed,
-                simplify,
-                texture_size,
-            )
+        loop = asyncio.get_running_loop()
+        pixels = await loop.run_in_executor(self._preprocess_executor, self._prepare_image, image)
+        return await self._submit(self._sample_image, (pixels, seed), (simplify, texture_size))
 
     async def generate_glb_bytes_from_text_async(
         self,
@@ -118,17 +590,12 @@ class ModelManager:
         simplify: float = 0.95,
         texture_size: int = 1024,
     ) -> bytes:
-        if self._lock is None:
-            raise RuntimeError("Model manager not initialized")
-
-        async with self._lock:
-            return await asyncio.to_thread(
-                self.generate_glb_bytes_from_text,
-                prompt,
-                seed,
-                simplify,
-                texture_size,
-            )
+        key = self.text_cache_key(prompt, seed, simplify, texture_size)
+        glb_bytes = await self._cached_text(key)
+        if glb_bytes is None:
+            glb_bytes = await self._submit(self._sample_text, (prompt, seed), (simplify, texture_size))
+            await self._store_text(key, glb_bytes)
+        return glb_bytes
 
 # a simple singleton used by the app
 manager = ModelManager()
@@ -0,0 +1,22 @@
+from typing import BinaryIO
+
+from PIL import Image
+
+# TrellisImageTo3DPipeline.preprocess_image shrinks inputs to 1024 px on the long
+# side before background removal, then crops to the object and resizes to 518.
+# Anything above 1024 px is thrown away, so drop it here while still in uint8.
+MAX_IMAGE_SIDE = 1024
+
+
+def load_image(fp: BinaryIO) -> Image.Image:
+    # Decoding straight from the file object avoids holding the raw upload in
+    # memory next to the decoded pixels.
+    image = Image.open(fp)
+    # For JPEGs this makes libjpeg decode at a reduced DCT scale that is still
+    # at least MAX_IMAGE_SIDE; other formats ignore it.
+    image.draft("RGB", (MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+    image.load()
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.BILINEAR)
+    return image